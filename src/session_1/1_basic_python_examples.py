@@ -26,16 +26,47 @@ squares = [x**2 for x in range(10)]
 even_squares = [x**2 for x in range(10) if x % 2 == 0]
 
 # Functions
+import math
+import numpy as np
+from numba import njit, prange
+
 def greet(name):
     """Simple greeting function"""
     return f"Hello, {name}!"
 
-def calculate_total(price, tax=0.18, discount=0):
+# Compiled on first call; cache=True reuses the machine code across runs
+@njit(cache=True)
+def calculate_total(price, tax=0.18, discount=0.0):
     """Calculate total with tax and discount"""
     subtotal = price * (1 - discount)
     total = subtotal * (1 + tax)
     return total
 
+# Batches at least this large are split across CPU cores
+PARALLEL_BATCH_SIZE = 100_000
+
+@njit(parallel=True, cache=True)
+def _calculate_totals_parallel(prices, tax, discount):
+    """Multicore loop over a 1-D batch of prices"""
+    totals = np.empty_like(prices)
+    for i in prange(prices.shape[0]):
+        totals[i] = calculate_total(prices[i], tax, discount)
+    return totals
+
+def calculate_totals(prices, tax=0.18, discount=0.0):
+    """Calculate totals for a whole batch of prices at once
+    
+    discount may be a single value or one value per price.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1 and prices.size >= PARALLEL_BATCH_SIZE and np.ndim(discount) == 0:
+        return _calculate_totals_parallel(prices, float(tax), float(discount))
+    
+    # One result array, scaled in place (no intermediate subtotal array)
+    totals = np.multiply(prices, 1 - np.asarray(discount, dtype=np.float64))
+    np.multiply(totals, 1 + tax, out=totals)
+    return totals
+
 # Error handling
 def safe_divide(a, b):
     """Safely divide two numbers"""
@@ -49,19 +80,28 @@ def safe_divide(a, b):
         print("Error: Please provide numbers!")
         return None
 
+@njit(cache=True)
+def safe_divide_nan(a, b):
+    """Divide two numbers, returning NaN instead of raising on zero"""
+    # Compiled code can't catch exceptions cheaply, so branch instead
+    if b == 0.0:
+        return math.nan
+    return a / b
+
 # File operations
-import json
+import orjson
 
 def save_config(config, filename="config.json"):
     """Save configuration to JSON file"""
-    with open(filename, "w") as file:
-        json.dump(config, file, indent=2)
+    # orjson works with bytes, so the file is opened in binary mode
+    with open(filename, "wb") as file:
+        file.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
 
 def load_config(filename="config.json"):
     """Load configuration from JSON file"""
     try:
-        with open(filename, "r") as file:
-            return json.load(file)
+        with open(filename, "rb") as file:
+            return orjson.loads(file.read())
     except FileNotFoundError:
         return {}
 
@@ -69,6 +109,8 @@ def load_config(filename="config.json"):
 if __name__ == "__main__":
     print(greet("World"))
     print(calculate_total(1000))
+    print(calculate_totals([1000, 250, 80], discount=[0.0, 0.1, 0.5]))
+    print(safe_divide_nan(10, 0))
     
     config = {
         "model": "gpt-4",
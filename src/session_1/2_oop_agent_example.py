@@ -3,32 +3,44 @@ OOP as Agent Identities
 Reference: docs/session_1/3_advanced_python_oop.md
 """
 
+from collections import deque, namedtuple
+
+# Oldest turns are dropped beyond this, keeping long sessions bounded
+MAX_HISTORY_TURNS = 200
+
+# One conversation turn; a tuple is far smaller than a dict per turn
+Turn = namedtuple("Turn", ["user", "agent"])
+
+
 class AIAgent:
     """A simple AI agent class"""
     
+    __slots__ = ("name", "model", "turns")
+    
+    _RESPONSE_TEMPLATE = "%s says: I understand '%s'"
+    
     def __init__(self, name, model="gpt-4"):
         """Initialize the agent"""
         self.name = name
         self.model = model
-        self.conversation_history = []
+        self.turns = deque(maxlen=MAX_HISTORY_TURNS)
     
     def respond(self, user_message):
         """Agent responds to user"""
-        response = f"{self.name} says: I understand '{user_message}'"
-        self.conversation_history.append({
-            "user": user_message,
-            "agent": response
-        })
+        response = self._RESPONSE_TEMPLATE % (self.name, user_message)
+        self.turns.append(Turn(user_message, response))
         return response
     
     def get_history(self):
         """Get conversation history"""
-        return self.conversation_history
+        return [turn._asdict() for turn in self.turns]
 
 
 class LegalAgent(AIAgent):
     """Specialized agent for legal advice"""
     
+    __slots__ = ("domain", "restricted_topics")
+    
     def __init__(self, name):
         super().__init__(name)
         self.domain = "Legal"
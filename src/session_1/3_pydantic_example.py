@@ -3,14 +3,19 @@ Pydantic & Type Hints Example
 Reference: docs/session_1/3_advanced_python_oop.md
 """
 
-from pydantic import BaseModel, Field, field_validator, ConfigDict
-from typing import Optional, Literal
+from pydantic import BaseModel, Field, field_validator, ConfigDict, StringConstraints
+from typing import Optional, Literal, Annotated
+
+# pydantic-core compiles the pattern once, when the model class is built
+EMAIL_PATTERN = r'^[\w\.-]+@[\w\.-]+\.\w+$'
+Email = Annotated[str, StringConstraints(pattern=EMAIL_PATTERN)]
+
 
 class UserInput(BaseModel):
     """User input model with validation"""
     name: str = Field(..., min_length=2, max_length=50)
     age: int = Field(..., ge=18, le=100)  # ge = greater or equal
-    email: str = Field(..., pattern=r'^[\w\.-]+@[\w\.-]+\.\w+$')
+    email: Email
     role: Optional[str] = "user"
     
     @field_validator('name')
@@ -23,7 +28,7 @@ class UserInput(BaseModel):
 
 class AIConfig(BaseModel):
     """AI model configuration"""
-    model_config = ConfigDict(frozen=True)  # Makes it immutable
+    model_config = ConfigDict(frozen=True, extra='forbid')  # Immutable, no unknown keys
     
     model_name: Literal["gpt-4", "gpt-3.5", "claude"] = "gpt-4"
     temperature: float = Field(0.7, ge=0.0, le=2.0)
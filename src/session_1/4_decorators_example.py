@@ -3,8 +3,12 @@ Decorators for AI Functions
 Reference: docs/session_1/3_advanced_python_oop.md
 """
 
+import asyncio
+import inspect
 import time
-from functools import wraps
+from collections import OrderedDict
+from functools import lru_cache, wraps
+from threading import Lock
 
 def log_calls(func):
     """Decorator to log function calls"""
@@ -34,45 +38,62 @@ def retry(max_attempts=3):
     return decorator
 
 
-def rate_limit(calls_per_minute=60):
-    """Limit API calls per minute"""
-    min_interval = 60.0 / calls_per_minute
-    last_called = [0.0]
+def rate_limit(calls_per_minute=60, key_fn=None, max_keys=1024):
+    """Limit API calls per minute
+    
+    Thread-safe: each call reserves its slot under a lock and sleeps
+    outside it. Pass key_fn (e.g. lambda user_id, *a, **kw: user_id) to
+    limit each key separately instead of all calls together.
+    Works on both regular and async functions; async ones wait with
+    asyncio.sleep so the event loop keeps running.
+    """
+    min_interval_ns = 60_000_000_000 // calls_per_minute
+    lock = Lock()
+    # Next free slot per key (monotonic clock); least recently used keys are evicted
+    next_slot_ns = OrderedDict()
+    
+    def reserve(args, kwargs):
+        """Claim the next free slot and return how long to wait (ns)"""
+        key = key_fn(*args, **kwargs) if key_fn else None
+        with lock:
+            now = time.monotonic_ns()
+            slot = max(now, next_slot_ns.get(key, now))
+            next_slot_ns[key] = slot + min_interval_ns
+            next_slot_ns.move_to_end(key)
+            if len(next_slot_ns) > max_keys:
+                next_slot_ns.popitem(last=False)
+        return slot - now
     
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                wait_ns = reserve(args, kwargs)
+                if wait_ns > 0:
+                    await asyncio.sleep(wait_ns / 1e9)
+                return await func(*args, **kwargs)
+            return async_wrapper
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            elapsed = time.time() - last_called[0]
-            left_to_wait = min_interval - elapsed
-            if left_to_wait > 0:
-                time.sleep(left_to_wait)
-            last_called[0] = time.time()
+            wait_ns = reserve(args, kwargs)
+            if wait_ns > 0:
+                time.sleep(wait_ns / 1e9)
             return func(*args, **kwargs)
         return wrapper
     return decorator
 
 
-def cache_results(func):
-    """Cache function results"""
-    cache = {}
+def cache_results(func=None, *, maxsize=None):
+    """Cache function results
     
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # Create cache key
-        key = str(args) + str(kwargs)
-        
-        # Check cache
-        if key in cache:
-            print(f"Cache hit for {func.__name__}!")
-            return cache[key]
-        
-        # Call function and cache result
-        result = func(*args, **kwargs)
-        cache[key] = result
-        print(f"Cached result for {func.__name__}")
-        return result
-    
-    return wrapper
+    Backed by functools.lru_cache, which keys on the hashed arguments
+    (kwargs included) instead of building a string key per call.
+    Use as @cache_results or @cache_results(maxsize=128).
+    """
+    if func is None:
+        return lambda f: cache_results(f, maxsize=maxsize)
+    return lru_cache(maxsize=maxsize)(func)
 
 
 # Example usage
@@ -113,4 +134,5 @@ if __name__ == "__main__":
     # Test cache
     result1 = expensive_ai_call("Hello")
     result2 = expensive_ai_call("Hello")  # Should use cache
+    print(expensive_ai_call.cache_info())
 
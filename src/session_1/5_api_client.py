@@ -3,12 +3,22 @@ API Client Example
 Reference: docs/session_1/4_apis_websockets_http.md
 """
 
+import orjson
 import requests
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
+
+from llm_utils import create_session
+
+
+# Shared by safe_api_call so repeated calls reuse connections
+_DEFAULT_SESSION = create_session()
+
 
 class APIClient:
     """Generic API client for AI services"""
     
+    __slots__ = ("base_url", "api_key", "headers", "session")
+    
     def __init__(self, base_url: str, api_key: str):
         """Initialize API client"""
         self.base_url = base_url
@@ -17,41 +27,63 @@ class APIClient:
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        self.session = create_session(self.headers)
     
     def get(self, endpoint: str) -> Dict[str, Any]:
         """Make GET request"""
         url = f"{self.base_url}/{endpoint}"
-        response = requests.get(url, headers=self.headers)
+        response = self.session.get(url)
         response.raise_for_status()  # Raise error if bad status
-        return response.json()
+        return orjson.loads(response.content)
     
     def post(self, endpoint: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Make POST request"""
         url = f"{self.base_url}/{endpoint}"
-        response = requests.post(url, json=data, headers=self.headers)
+        response = self.session.post(url, json=data)
         response.raise_for_status()
-        return response.json()
+        return orjson.loads(response.content)
     
-    def stream_post(self, endpoint: str, data: Dict[str, Any]):
-        """Stream POST request"""
+    def stream_post(self, endpoint: str, data: Dict[str, Any],
+                    content_only: bool = False) -> Iterator[Any]:
+        """Stream POST request, yielding each server-sent event as parsed JSON
+        
+        With content_only=True, yields only the text of OpenAI-style
+        chunks (choices[0].delta.content).
+        """
         url = f"{self.base_url}/{endpoint}"
         data["stream"] = True
-        response = requests.post(url, json=data, headers=self.headers, stream=True)
-        response.raise_for_status()
-        return response
+        with self.session.post(url, json=data, stream=True) as response:
+            response.raise_for_status()
+            for line in response.iter_lines(chunk_size=8192):
+                if not line.startswith(b"data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == b"[DONE]":
+                    break
+                event = orjson.loads(payload)
+                if not content_only:
+                    yield event
+                    continue
+                choices = event.get("choices")
+                if choices:
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
 
 
-def safe_api_call(url: str, headers: dict, data: dict = None):
+def safe_api_call(url: str, headers: dict, data: dict = None,
+                  session: Optional[requests.Session] = None):
     """Safely call API with error handling"""
+    session = session or _DEFAULT_SESSION
     try:
         if data:
-            response = requests.post(url, json=data, headers=headers)
+            response = session.post(url, json=data, headers=headers)
         else:
-            response = requests.get(url, headers=headers)
+            response = session.get(url, headers=headers)
         
         # Check status code
         response.raise_for_status()
-        return {"success": True, "data": response.json()}
+        return {"success": True, "data": orjson.loads(response.content)}
     
     except requests.exceptions.HTTPError as e:
         return {"success": False, "error": f"HTTP Error: {e}"}
@@ -61,6 +93,8 @@ def safe_api_call(url: str, headers: dict, data: dict = None):
         return {"success": False, "error": "Request timeout"}
     except requests.exceptions.RequestException as e:
         return {"success": False, "error": f"Request failed: {e}"}
+    except orjson.JSONDecodeError as e:
+        return {"success": False, "error": f"Invalid JSON response: {e}"}
 
 
 # Example usage
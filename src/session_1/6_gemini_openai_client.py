@@ -3,126 +3,278 @@ Gemini & OpenAI Client
 Reference: docs/session_1/5_practical_gemini_openai.md
 """
 
+import asyncio
+import httpx
+from collections import deque
+from functools import lru_cache
 import requests
-import json
-from typing import Literal
-from openai import OpenAI
+import orjson
+from typing import List, Literal, Optional
+from openai import AsyncOpenAI, OpenAI
+
+from llm_utils import create_session
+
+# Shared async client: HTTP/2 lets concurrent requests share one connection.
+# Its pooled connections belong to one event loop, so there is one per loop
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Get the shared HTTP/2 client for the running event loop"""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(
+            http2=True,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=30.0
+        )
+        _async_client_loop = loop
+    return _async_client
+
+
+async def close_async_client():
+    """Close the shared client before the event loop shuts down"""
+    global _async_client
+    if _async_client is not None and not _async_client.is_closed:
+        await _async_client.aclose()
+    _async_client = None
+
+class EmptyResponseError(Exception):
+    """The provider answered without any text (e.g. a blocked prompt)"""
+
+
+# Oldest messages are dropped beyond this, keeping long sessions bounded
+MAX_HISTORY_MESSAGES = 200
 
 class GeminiClient:
     """Google Gemini API client"""
     
+    __slots__ = ("api_key", "url", "session", "_cached_generate")
+    
     def __init__(self, api_key: str):
         """Initialize Gemini client"""
         self.api_key = api_key
-    
-    def chat(self, prompt: str) -> str:
-        """Send prompt to Gemini and get response"""
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={self.api_key}"
+        self.url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={api_key}"
+        
+        # Pooled session: later calls skip the TCP/TLS handshake
+        self.session = create_session({"Content-Type": "application/json"})
         
-        payload = {
+        # Per-client cache of repeated prompts; failures and empty answers raise
+        # and are never cached.
+        # Built here, not with a decorator, so it dies with the client
+        self._cached_generate = lru_cache(maxsize=256)(self._generate)
+    
+    def _payload(self, prompt: str) -> bytes:
+        """Serialized request body for a prompt"""
+        return orjson.dumps({
             "contents": [{
                 "parts": [{
                     "text": prompt
                 }]
             }]
-        }
-        
-        headers = {
-            "Content-Type": "application/json"
-        }
+        })
+    
+    def _extract_text(self, result: dict) -> str:
+        """Extract text from response (raises EmptyResponseError if there is none)"""
+        try:
+            return result['candidates'][0]['content']['parts'][0]['text']
+        except (KeyError, IndexError):
+            # No candidates, or a candidate blocked before producing text
+            raise EmptyResponseError("No response from Gemini") from None
+    
+    def _generate(self, prompt: str) -> str:
+        """Request a response from Gemini"""
+        # Pre-serialized with orjson; the session already sends the JSON Content-Type
+        response = self.session.post(self.url, data=self._payload(prompt))
+        response.raise_for_status()
+        return self._extract_text(orjson.loads(response.content))
+    
+    def chat(self, prompt: str) -> str:
+        """Send prompt to Gemini and get response"""
+        try:
+            return self._cached_generate(prompt)
         
+        except EmptyResponseError as e:
+            return str(e)
+        except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
+            return f"Error: {str(e)}"
+    
+    async def chat_async(self, prompt: str) -> str:
+        """Send prompt to Gemini without blocking the event loop"""
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = await get_async_client().post(
+                self.url,
+                content=self._payload(prompt),
+                headers={"Content-Type": "application/json"}
+            )
             response.raise_for_status()
-            
-            result = response.json()
-            
-            # Extract text from response
-            if 'candidates' in result and len(result['candidates']) > 0:
-                text = result['candidates'][0]['content']['parts'][0]['text']
-                return text
-            else:
-                return "No response from Gemini"
+            return self._extract_text(orjson.loads(response.content))
         
-        except requests.exceptions.RequestException as e:
+        except EmptyResponseError as e:
+            return str(e)
+        except (httpx.HTTPError, orjson.JSONDecodeError) as e:
             return f"Error: {str(e)}"
 
 
 class OpenAIClient:
     """OpenAI API client using OpenAI SDK"""
     
+    __slots__ = ("api_key", "client", "async_client", "_async_http", "request_defaults", "_cached_complete")
+    
     def __init__(self, api_key: str):
         """Initialize OpenAI client"""
+        self.api_key = api_key
         self.client = OpenAI(api_key=api_key)
+        # Built per event loop, on that loop's shared HTTP/2 client
+        self.async_client: Optional[AsyncOpenAI] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+        # Settings shared by every request, built once
+        self.request_defaults = {"temperature": 0.7, "max_tokens": 1000}
+        
+        # Per-client cache of repeated prompts; failures and empty answers raise
+        # and are never cached
+        self._cached_complete = lru_cache(maxsize=256)(self._complete)
+    
+    def _complete(self, prompt: str, model: str) -> str:
+        """Request a completion from OpenAI"""
+        response = self.client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "user", "content": prompt}
+            ],
+            **self.request_defaults
+        )
+        return self._extract_text(response)
+    
+    def _extract_text(self, response) -> str:
+        """Extract text from a completion (raises EmptyResponseError if there is none)"""
+        content = response.choices[0].message.content
+        if not content:
+            raise EmptyResponseError("No response from OpenAI")
+        return content
+    
+    def _get_async_client(self) -> AsyncOpenAI:
+        """AsyncOpenAI bound to the running event loop's shared HTTP client"""
+        http_client = get_async_client()
+        if self.async_client is None or self._async_http is not http_client:
+            self.async_client = AsyncOpenAI(api_key=self.api_key, http_client=http_client)
+            self._async_http = http_client
+        return self.async_client
     
     def chat(self, prompt: str, model: str = "gpt-3.5-turbo") -> str:
         """Send prompt to OpenAI and get response"""
         try:
-            response = self.client.chat.completions.create(
+            return self._cached_complete(prompt, model)
+        
+        except EmptyResponseError as e:
+            return str(e)
+        except Exception as e:
+            return f"Error: {str(e)}"
+    
+    async def chat_async(self, prompt: str, model: str = "gpt-3.5-turbo") -> str:
+        """Send prompt to OpenAI without blocking the event loop"""
+        try:
+            response = await self._get_async_client().chat.completions.create(
                 model=model,
                 messages=[
                     {"role": "user", "content": prompt}
                 ],
-                temperature=0.7,
-                max_tokens=1000
+                **self.request_defaults
             )
-            return response.choices[0].message.content
+            return self._extract_text(response)
         
+        except EmptyResponseError as e:
+            return str(e)
         except Exception as e:
             return f"Error: {str(e)}"
 
 
+# Provider name -> client class
+PROVIDERS = {
+    "openai": OpenAIClient,
+    "gemini": GeminiClient
+}
+
+
 class UnifiedAIClient:
     """Unified client for multiple AI providers"""
     
+    __slots__ = ("provider", "api_key", "client", "_chat", "_chat_async")
+    
     def __init__(self, provider: Literal["openai", "gemini"], api_key: str):
         """Initialize with provider choice"""
+        if provider not in PROVIDERS:
+            raise ValueError(f"Unknown provider: {provider}")
         self.provider = provider
         self.api_key = api_key
+        self.client = PROVIDERS[provider](api_key)
         
-        if provider == "openai":
-            self.openai_client = OpenAIClient(api_key)
-        elif provider == "gemini":
-            self.gemini_client = GeminiClient(api_key)
+        # Bound once here, so chat() needs no per-call provider branch
+        self._chat = self.client.chat
+        self._chat_async = self.client.chat_async
     
     def chat(self, prompt: str) -> str:
         """Chat with selected AI provider"""
-        if self.provider == "openai":
-            return self.openai_client.chat(prompt)
-        elif self.provider == "gemini":
-            return self.gemini_client.chat(prompt)
+        return self._chat(prompt)
+    
+    async def chat_async(self, prompt: str) -> str:
+        """Async chat with selected AI provider"""
+        return await self._chat_async(prompt)
 
 
 class SimpleChatBot:
     """Simple chatbot using AI APIs"""
     
+    __slots__ = ("client", "roles", "contents")
+    
     def __init__(self, provider: str, api_key: str):
         """Initialize chatbot"""
         self.client = UnifiedAIClient(provider, api_key)
-        self.conversation_history = []
+        # Parallel bounded buffers instead of one dict per message
+        self.roles = deque(maxlen=MAX_HISTORY_MESSAGES)
+        self.contents = deque(maxlen=MAX_HISTORY_MESSAGES)
+    
+    def _record(self, user_message: str, response: str):
+        """Add a user/assistant exchange to history"""
+        self.roles.append("user")
+        self.contents.append(user_message)
+        self.roles.append("assistant")
+        self.contents.append(response)
     
     def chat(self, user_message: str) -> str:
         """Chat with user"""
-        # Add user message to history
-        self.conversation_history.append({
-            "role": "user",
-            "content": user_message
-        })
-        
-        # Get AI response
         response = self.client.chat(user_message)
-        
-        # Add AI response to history
-        self.conversation_history.append({
-            "role": "assistant",
-            "content": response
-        })
-        
+        self._record(user_message, response)
         return response
     
+    async def chat_async(self, user_message: str) -> str:
+        """Chat with user without blocking the event loop"""
+        response = await self.client.chat_async(user_message)
+        self._record(user_message, response)
+        return response
+    
+    async def chat_many(self, user_messages: List[str]) -> List[str]:
+        """Send independent messages concurrently"""
+        try:
+            responses = await asyncio.gather(
+                *(self.client.chat_async(message) for message in user_messages)
+            )
+        finally:
+            # Each asyncio.run() has its own loop; don't leave its client open
+            await close_async_client()
+        # Record in input order, whatever order the responses arrived in
+        for message, response in zip(user_messages, responses):
+            self._record(message, response)
+        return list(responses)
+    
     def get_history(self):
-        """Get conversation history"""
-        return self.conversation_history
+        """Get conversation history as role/content dicts"""
+        return [
+            {"role": role, "content": content}
+            for role, content in zip(self.roles, self.contents)
+        ]
 
 
 # Example usage
@@ -141,4 +293,10 @@ if __name__ == "__main__":
     bot_response = bot.chat("What is Python?")
     print(f"Bot Response: {bot_response}\n")
     
+    # Test concurrent requests
+    print("Testing concurrent chat with Gemini...")
+    questions = ["What is NumPy?", "What is an API?", "What is a token?"]
+    for question, answer in zip(questions, asyncio.run(bot.chat_many(questions))):
+        print(f"{question} -> {answer}\n")
+    
     print("✅ All tests passed!")
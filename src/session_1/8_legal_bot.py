@@ -3,29 +3,69 @@ Secure Legal-Advice Bot
 Reference: docs/session_1/7_practical_legal_bot.md
 """
 
-import requests
+import asyncio
+import ahocorasick
 import re
-from typing import Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from llm_utils import (
+    MODELS, BatchProcessor, ResponseCache, close_async_session, fits_context,
+    post_json_async, response_cache_key, stream_text
+)
+
+
+# Shared, immutable blocklists (no per-instance copies)
+ILLEGAL_KEYWORDS = (
+    "how to hack", "how to steal", "how to cheat",
+    "illegal way", "break the law", "avoid taxes illegally",
+    "money laundering", "drug dealing", "weapon", "violence"
+)
+INJECTION_PATTERNS = (
+    r"ignore.*instruction", r"forget.*you.*are",
+    r"system.*prompt", r"previous.*instruction"
+)
+
+# Phrases that mark an unsafe model response
+DANGEROUS_PHRASES = (
+    "here's how to",
+    "you can illegally",
+    "to hack",
+    "to steal"
+)
+# Aho-Corasick automaton: one pass over a response checks every phrase
+_DANGEROUS_AC = ahocorasick.Automaton()
+for _phrase in DANGEROUS_PHRASES:
+    _DANGEROUS_AC.add_word(_phrase, _phrase)
+_DANGEROUS_AC.make_automaton()
 
 
 class SecureLegalBot:
     """Secure legal advice bot"""
     
-    def __init__(self, api_key: str, provider: str = "gemini"):
-        """Initialize legal bot"""
+    # Compiled once at class definition instead of on every query.
+    # Byte patterns, matched against the lowered UTF-8 query
+    _ILLEGAL_RE = re.compile(b"|".join(re.escape(k.encode()) for k in ILLEGAL_KEYWORDS))
+    _INJECTION_RES = [re.compile(pattern.encode()) for pattern in INJECTION_PATTERNS]
+    # Every blocklist entry in a single alternation, so clean queries need one scan
+    _BLOCKLIST_RE = re.compile(b"|".join(
+        [re.escape(keyword.encode()) for keyword in ILLEGAL_KEYWORDS]
+        + [b"(?:" + pattern.encode() + b")" for pattern in INJECTION_PATTERNS]
+    ))
+    
+    def __init__(self, api_key: str, provider: str = "gemini", cache: Optional[ResponseCache] = None):
+        """Initialize legal bot
+        
+        Pass a ResponseCache (e.g. one backed by Redis) to share answers
+        between bots; by default each bot keeps its own in-process cache.
+        """
         self.api_key = api_key
         self.provider = provider
+        self.max_tokens = 500
+        self.cache = cache or ResponseCache()
         
         # Security keywords (inline security check)
-        self.illegal_keywords = [
-            "how to hack", "how to steal", "how to cheat",
-            "illegal way", "break the law", "avoid taxes illegally",
-            "money laundering", "drug dealing", "weapon", "violence"
-        ]
-        self.injection_patterns = [
-            r"ignore.*instruction", r"forget.*you.*are",
-            r"system.*prompt", r"previous.*instruction"
-        ]
+        self.illegal_keywords = ILLEGAL_KEYWORDS
+        self.injection_patterns = INJECTION_PATTERNS
         
         # System prompt with strict boundaries
         self.system_prompt = """You are a legal information assistant.
@@ -47,8 +87,8 @@ Your responses should be:
 - Clear about limitations
 - Safe and ethical"""
     
-    def _call_openai(self, prompt: str) -> str:
-        """Call OpenAI API"""
+    def _openai_request(self, prompt: str, stream: bool = False) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """Build OpenAI URL, headers and payload"""
         url = "https://api.openai.com/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -56,26 +96,21 @@ Your responses should be:
         }
         
         payload = {
-            "model": "gpt-3.5-turbo",
+            "model": MODELS["openai"],
             "messages": [
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": prompt}
             ],
             "temperature": 0.3,
-            "max_tokens": 500
+            "max_tokens": self.max_tokens,
+            "stream": stream
         }
-        
-        try:
-            response = requests.post(url, json=payload, headers=headers)
-            response.raise_for_status()
-            result = response.json()
-            return result['choices'][0]['message']['content']
-        except Exception as e:
-            return f"Error: {str(e)}"
+        return url, headers, payload
     
-    def _call_gemini(self, prompt: str) -> str:
-        """Call Gemini API"""
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={self.api_key}"
+    def _gemini_request(self, prompt: str, stream: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """Build Gemini URL and payload"""
+        method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELS['gemini']}:{method}key={self.api_key}"
         
         full_prompt = f"{self.system_prompt}\n\nUser Question: {prompt}"
         
@@ -84,75 +119,166 @@ Your responses should be:
                 "parts": [{"text": full_prompt}]
             }]
         }
-        
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            return result['candidates'][0]['content']['parts'][0]['text']
-        except Exception as e:
-            return f"Error: {str(e)}"
+        return url, payload
+    
+    def _stream(self, provider: str, prompt: str) -> Iterator[str]:
+        """Stream the response from either provider, one text fragment at a time"""
+        if provider == "openai":
+            url, headers, payload = self._openai_request(prompt, stream=True)
+            return stream_text(provider, url, payload, headers)
+        url, payload = self._gemini_request(prompt, stream=True)
+        return stream_text(provider, url, payload)
+    
+    def _call_openai(self, prompt: str) -> str:
+        """Call OpenAI API (raises on failure)"""
+        # The safety filter needs the whole text, so collect the stream
+        return "".join(self._stream("openai", prompt))
+    
+    def _call_gemini(self, prompt: str) -> str:
+        """Call Gemini API (raises on failure)"""
+        # The safety filter needs the whole text, so collect the stream
+        return "".join(self._stream("gemini", prompt))
+    
+    async def _call_openai_async(self, prompt: str) -> str:
+        """Call OpenAI API on the shared keep-alive session (raises on failure)"""
+        url, headers, payload = self._openai_request(prompt)
+        result = await post_json_async(url, payload, headers)
+        return result['choices'][0]['message']['content']
+    
+    async def _call_gemini_async(self, prompt: str) -> str:
+        """Call Gemini API on the shared keep-alive session (raises on failure)"""
+        url, payload = self._gemini_request(prompt)
+        result = await post_json_async(url, payload)
+        return result['candidates'][0]['content']['parts'][0]['text']
+    
+    async def _complete_async(self, prompt: str) -> str:
+        """Call the configured provider asynchronously (raises on failure)"""
+        if self.provider == "openai":
+            return await self._call_openai_async(prompt)
+        return await self._call_gemini_async(prompt)
     
     def _filter_response(self, response: str) -> str:
         """Filter response for safety"""
-        dangerous_phrases = [
-            "here's how to",
-            "you can illegally",
-            "to hack",
-            "to steal"
-        ]
-        
-        response_lower = response.lower()
-        for phrase in dangerous_phrases:
-            if phrase in response_lower:
-                return "I cannot provide that information. Please consult a licensed attorney for legal advice."
+        for _ in _DANGEROUS_AC.iter(response.lower()):
+            return "I cannot provide that information. Please consult a licensed attorney for legal advice."
         
         return response
     
     def _validate_input(self, query: str) -> Tuple[bool, str]:
         """Validate input for security"""
-        query_lower = query.lower()
+        # One lowering pass shared by every check below. Full Unicode lower()
+        # first: some non-ASCII letters (e.g. the Kelvin sign) lower to ASCII
+        query_lower = query.lower().encode("utf-8", "ignore")
         
-        # Check illegal content
-        for keyword in self.illegal_keywords:
-            if keyword in query_lower:
-                return False, "Query blocked: Contains illegal content reference"
+        # Fast path: one regex pass clears clean queries
+        if not self._BLOCKLIST_RE.search(query_lower):
+            return True, "Valid"
+        
+        # Check illegal content (one regex pass covers every keyword)
+        if self._ILLEGAL_RE.search(query_lower):
+            return False, "Query blocked: Contains illegal content reference"
         
         # Check injection
-        for pattern in self.injection_patterns:
-            if re.search(pattern, query_lower):
+        for rx in self._INJECTION_RES:
+            if rx.search(query_lower):
                 return False, "Query blocked: Potential security threat"
         
         return True, "Valid"
     
+    def _fits(self, prompt: str) -> bool:
+        """Whether system prompt, prompt and reply fit the model's context window"""
+        return fits_context(self.provider, self.system_prompt, prompt, self.max_tokens)
+    
+    def _blocked_response(self, message: str) -> str:
+        """Response for a query that failed validation"""
+        return f"❌ {message}\n\nI cannot assist with that query. Please ask about general legal information or consult a licensed attorney."
+    
+    def _safe_prompt(self, question: str) -> str:
+        """Add safety reminder to prompt"""
+        return f"""User Question: {question}
+
+Remember: 
+- Provide only general legal information
+- Refuse any illegal requests
+- Recommend consulting an attorney for specific advice"""
+    
+    def _finalize(self, response: str) -> str:
+        """Filter response and add disclaimer"""
+        filtered_response = self._filter_response(response)
+        return f"{filtered_response}\n\n⚠️ Disclaimer: This is general information only, not legal advice. Consult a licensed attorney for specific legal matters."
+    
     def ask(self, question: str) -> str:
         """Ask legal question safely"""
         # Step 1: Validate input
         is_valid, message = self._validate_input(question)
         if not is_valid:
-            return f"❌ {message}\n\nI cannot assist with that query. Please ask about general legal information or consult a licensed attorney."
+            return self._blocked_response(message)
         
-        # Step 2: Add safety reminder to prompt
-        safe_prompt = f"""User Question: {question}
-
-Remember: 
-- Provide only general legal information
-- Refuse any illegal requests
-- Recommend consulting an attorney for specific advice"""
+        # Step 2: Add safety reminder to prompt; skip the call if it can't fit
+        safe_prompt = self._safe_prompt(question)
+        if not self._fits(safe_prompt):
+            return self._blocked_response("Query blocked: Too long for the model's context window")
         
-        # Step 3: Get AI response
-        if self.provider == "openai":
-            response = self._call_openai(safe_prompt)
-        else:
-            response = self._call_gemini(safe_prompt)
+        # Step 3: Answer repeat questions from the cache
+        key = response_cache_key(self.provider, self.system_prompt, question)
+        response = self.cache.get(key)
         
-        # Step 4: Filter response
-        filtered_response = self._filter_response(response)
+        if response is None:
+            # Step 4: Get AI response (only successful responses are cached)
+            try:
+                if self.provider == "openai":
+                    response = self._call_openai(safe_prompt)
+                else:
+                    response = self._call_gemini(safe_prompt)
+            except Exception as e:
+                response = f"Error: {str(e)}"
+            else:
+                self.cache.set(key, response)
         
-        # Step 5: Add disclaimer
-        final_response = f"{filtered_response}\n\n⚠️ Disclaimer: This is general information only, not legal advice. Consult a licensed attorney for specific legal matters."
+        # Steps 5-6: Filter response, add disclaimer
+        return self._finalize(response)
+    
+    async def ask_async(self, question: str, batch: Optional[BatchProcessor] = None) -> str:
+        """Ask legal question safely without blocking the event loop
         
-        return final_response
+        Many questions can be in flight at once over one pooled connection.
+        Pass a BatchProcessor to run under its concurrency and rate limits.
+        """
+        is_valid, message = self._validate_input(question)
+        if not is_valid:
+            return self._blocked_response(message)
+        
+        safe_prompt = self._safe_prompt(question)
+        if not self._fits(safe_prompt):
+            return self._blocked_response("Query blocked: Too long for the model's context window")
+        
+        key = response_cache_key(self.provider, self.system_prompt, question)
+        response = self.cache.get(key)
+        if response is not None:
+            return self._finalize(response)
+        
+        try:
+            if batch is None:
+                response = await self._complete_async(safe_prompt)
+            else:
+                # Rough size: ~4 characters per token, plus the completion budget
+                tokens = len(safe_prompt) // 4 + self.max_tokens
+                response = await batch.submit(self._complete_async, safe_prompt, tokens=tokens)
+        except Exception as e:
+            response = f"Error: {str(e)}"
+        else:
+            self.cache.set(key, response)
+        
+        return self._finalize(response)
+    
+    async def ask_many(self, questions: List[str], batch: Optional[BatchProcessor] = None) -> List[str]:
+        """Ask many questions concurrently, respecting provider rate limits"""
+        batch = batch or BatchProcessor()
+        try:
+            return list(await asyncio.gather(*(self.ask_async(q, batch) for q in questions)))
+        finally:
+            # Each asyncio.run() has its own loop; don't leave its session open
+            await close_async_session()
 
 
 def run_legal_bot():
@@ -173,20 +299,29 @@ def run_legal_bot():
     print("\n" + "=" * 60)
     print("Bot ready! Ask your legal questions.\n")
     
-    while True:
-        question = input("You: ").strip()
-        
-        if question.lower() in ['quit', 'exit', 'bye']:
-            print("\n👋 Thank you for using Legal Information Assistant!")
-            break
-        
-        if not question:
-            continue
-        
-        print("\n🤖 Legal Assistant: ", end='')
-        response = bot.ask(question)
-        print(response)
-        print()
+    # One event loop for the whole session keeps the connection pool warm
+    asyncio.run(_chat_loop(bot))
+
+
+async def _chat_loop(bot: SecureLegalBot):
+    """Interactive question loop"""
+    try:
+        while True:
+            question = (await asyncio.to_thread(input, "You: ")).strip()
+            
+            if question.lower() in ['quit', 'exit', 'bye']:
+                print("\n👋 Thank you for using Legal Information Assistant!")
+                break
+            
+            if not question:
+                continue
+            
+            print("\n🤖 Legal Assistant: ", end='')
+            response = await bot.ask_async(question)
+            print(response)
+            print()
+    finally:
+        await close_async_session()
 
 
 if __name__ == "__main__":
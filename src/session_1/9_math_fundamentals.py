@@ -4,22 +4,57 @@ Reference: docs/session_1/8_math_fundamentals.md
 """
 
 import math
+import os
+from functools import lru_cache
+
 import numpy as np
 import tiktoken
+from numba import njit
 
 
-def softmax(scores):
-    """Calculate softmax probabilities"""
-    # Step 1: Calculate exponentials
-    exp_scores = [math.exp(score) for score in scores]
+def softmax(scores, temperature=1.0):
+    """Calculate softmax probabilities
+    
+    Numerically stable: subtracting the max score first keeps exp() from
+    overflowing on large scores. float32 is plenty for sampling and halves
+    memory traffic.
+    """
+    # Step 1: Scale scores (a new array, so the steps below can work in place)
+    x = np.asarray(scores, dtype=np.float32) / temperature
     
-    # Step 2: Calculate sum
-    sum_exp = sum(exp_scores)
+    # Step 2: Shift so the largest score is 0, then exponentiate
+    x -= x.max()
+    np.exp(x, out=x)
     
-    # Step 3: Calculate probabilities
-    probabilities = [exp / sum_exp for exp in exp_scores]
+    # Step 3: Normalize to probabilities
+    x /= x.sum()
+    return x
+
+
+@njit(cache=True, fastmath=True)
+def _softmax_temp(logits, temperature):
+    """Fused stable softmax: max, exp, sum and divide in one compiled loop
     
-    return probabilities
+    For small vocabularies this beats NumPy, whose per-ufunc call overhead
+    dominates at that size.
+    """
+    n = logits.shape[0]
+    m = logits[0]
+    for i in range(1, n):
+        if logits[i] > m:
+            m = logits[i]
+    total = 0.0
+    out = np.empty(n, np.float32)
+    for i in range(n):
+        out[i] = math.exp((logits[i] - m) / temperature)
+        total += out[i]
+    for i in range(n):
+        out[i] /= total
+    return out
+
+
+# Compile (or load from cache) at import, not on the first generated word
+_softmax_temp(np.zeros(1), 1.0)
 
 
 def softmax_numpy(scores):
@@ -34,14 +69,31 @@ def apply_temperature(logits, temperature=1.0):
     Logits are raw scores from the AI model before applying softmax.
     They represent the model's confidence scores for each possible token.
     """
-    # Divide by temperature
-    scaled_logits = logits / temperature
-    
-    # Apply softmax
-    exp_scores = np.exp(scaled_logits)
-    probabilities = exp_scores / np.sum(exp_scores)
+    # Divide by temperature, then apply softmax
+    return softmax(logits, temperature)
+
+
+@lru_cache(maxsize=8)
+def get_encoding(model="gpt-3.5-turbo"):
+    """Load a model's tiktoken encoder once and reuse it"""
+    return tiktoken.encoding_for_model(model)
+
+
+def decode_tokens(encoding, tokens):
+    """Decode each token to its string in one call into tiktoken"""
+    return [
+        token_bytes.decode("utf-8", errors="replace")
+        for token_bytes in encoding.decode_tokens_bytes(tokens)
+    ]
+
+
+def char_tokenize_bytes(text):
+    """Byte-level tokenization: one uint8 token per UTF-8 byte
     
-    return probabilities
+    A read-only NumPy view over the encoded bytes, so a large text costs
+    one buffer instead of one Python string object per character.
+    """
+    return np.frombuffer(text.encode("utf-8"), dtype=np.uint8)
 
 
 def tokenize_with_bpe(text, model="gpt-3.5-turbo"):
@@ -50,14 +102,14 @@ def tokenize_with_bpe(text, model="gpt-3.5-turbo"):
     BPE is the tokenization method used by OpenAI models.
     It breaks text into subword units that are efficient for AI processing.
     """
-    # Initialize tiktoken encoder
-    encoding = tiktoken.encoding_for_model(model)
+    # Get the (cached) tiktoken encoder
+    encoding = get_encoding(model)
     
-    # Tokenize text
-    tokens = encoding.encode(text)
+    # Tokenize text (plain text: no special-token handling needed)
+    tokens = encoding.encode_ordinary(text)
     
     # Decode tokens back to see what they represent
-    token_strings = [encoding.decode([token]) for token in tokens]
+    token_strings = decode_tokens(encoding, tokens)
     
     return {
         "tokens": tokens,
@@ -69,16 +121,16 @@ def tokenize_with_bpe(text, model="gpt-3.5-turbo"):
 
 def analyze_bpe_tokenization(text, model="gpt-3.5-turbo"):
     """Analyze BPE tokenization statistics"""
-    encoding = tiktoken.encoding_for_model(model)
-    tokens = encoding.encode(text)
-    token_strings = [encoding.decode([token]) for token in tokens]
+    encoding = get_encoding(model)
+    tokens = encoding.encode_ordinary(text)
+    preview = tokens[:10]  # First 10 tokens: the only ones worth decoding
     
     stats = {
         "original_text": text,
         "original_length": len(text),
         "token_count": len(tokens),
-        "tokens": tokens[:10],  # First 10 tokens
-        "token_strings": token_strings[:10],  # First 10 token strings
+        "tokens": preview,
+        "token_strings": decode_tokens(encoding, preview),
         "tokens_per_character": len(tokens) / len(text) if text else 0,
         "vocabulary_size": encoding.n_vocab
     }
@@ -93,28 +145,59 @@ class SimpleTextGenerator:
         self.temperature = temperature
         self.vocab = ["hello", "world", "ai", "is", "awesome", "cool"]
         self.vocab_size = len(self.vocab)
+        # One PCG64 generator per instance, faster than the legacy global RandomState
+        self._rng = np.random.default_rng()
+    
+    def tokenize(self, text):
+        """Simple tokenization"""
+        return text.lower().split()
     
     def softmax(self, logits):
         """Calculate softmax with temperature
         
         Logits are raw model scores before probability conversion.
         """
-        exp_scores = np.exp(logits / self.temperature)
-        return exp_scores / np.sum(exp_scores)
+        return _softmax_temp(logits, self.temperature)
     
     def predict_next_word(self, context):
         """Predict next word using softmax and temperature"""
         # Simulate logits (raw scores from model)
-        logits = np.random.randn(self.vocab_size) * 2
+        logits = self._rng.standard_normal(self.vocab_size) * 2
         
         # Apply softmax with temperature
         probabilities = self.softmax(logits)
         
-        # Sample based on probabilities
-        next_word_idx = np.random.choice(self.vocab_size, p=probabilities)
-        next_word = self.vocab[next_word_idx]
+        # Sample based on probabilities: inverse CDF, one cumsum + one binary search
+        cdf = np.cumsum(probabilities)
+        next_word_idx = int(np.searchsorted(cdf, self._rng.random() * cdf[-1], side="right"))
+        next_word = self.vocab[min(next_word_idx, self.vocab_size - 1)]
         
         return next_word, probabilities, logits
+    
+    def generate(self, prompt, length=5):
+        """Generate text
+        
+        The simulated scores don't depend on the context, so every step is
+        sampled at once: one (length x vocab) softmax and one inverse-CDF
+        draw per row, instead of a Python loop of predict_next_word calls.
+        """
+        tokens = self.tokenize(prompt)
+        
+        # Logits for every step, scaled by temperature
+        probs = self._rng.standard_normal((length, self.vocab_size), dtype=np.float32)
+        probs *= 2 / self.temperature
+        
+        # Row-wise stable softmax, in place
+        probs -= probs.max(axis=1, keepdims=True)
+        np.exp(probs, out=probs)
+        probs /= probs.sum(axis=1, keepdims=True)
+        
+        # Inverse CDF per row: count the CDF entries below each uniform draw
+        cdf = probs.cumsum(axis=1)
+        u = self._rng.random(length, dtype=np.float32) * cdf[:, -1]
+        word_idx = np.minimum((cdf <= u[:, None]).sum(axis=1), self.vocab_size - 1)
+        
+        return " ".join(tokens + [self.vocab[i] for i in word_idx])
 
 
 # Example usage
@@ -145,6 +228,14 @@ if __name__ == "__main__":
             print(f"  {word}: {prob:.2%}")
         print()
     
+    print("=" * 60)
+    print("BYTE-LEVEL TOKENIZATION")
+    print("=" * 60)
+    byte_tokens = char_tokenize_bytes("Hello AI!")
+    print("Text: 'Hello AI!'")
+    print(f"Byte tokens: {byte_tokens}")
+    print(f"Token count: {byte_tokens.size} (one per byte, vocabulary of 256)\n")
+    
     print("=" * 60)
     print("BPE TOKENIZATION WITH TIKTOKEN")
     print("=" * 60)
@@ -157,12 +248,15 @@ if __name__ == "__main__":
         "The quick brown fox jumps over the lazy dog."
     ]
     
-    for text in texts:
-        result = tokenize_with_bpe(text)
+    # Encode every text in one call; tiktoken spreads the batch over threads
+    encoding = get_encoding("gpt-3.5-turbo")
+    batch = encoding.encode_ordinary_batch(texts, num_threads=os.cpu_count() or 4)
+    
+    for text, tokens in zip(texts, batch):
         print(f"\nText: '{text}'")
-        print(f"Token count: {result['token_count']}")
-        print(f"Tokens: {result['tokens'][:10]}...")  # First 10 tokens
-        print(f"Token strings: {result['token_strings'][:10]}...")  # First 10 token strings
+        print(f"Token count: {len(tokens)}")
+        print(f"Tokens: {tokens[:10]}...")  # First 10 tokens
+        print(f"Token strings: {decode_tokens(encoding, tokens[:10])}...")  # First 10 token strings
     
     print("\n" + "=" * 60)
     print("BPE TOKENIZATION ANALYSIS")
@@ -195,6 +289,10 @@ if __name__ == "__main__":
     next_word, probs, logits = generator_high.predict_next_word("context")
     print(f"Logits: {logits}")
     print(f"Probabilities: {probs}")
-    print(f"Selected word: {next_word}")
+    print(f"Selected word: {next_word}\n")
+    
+    print("Generated text (all steps sampled in one batch):")
+    print(f"  Low temperature:  {generator_low.generate('Hello world', length=5)}")
+    print(f"  High temperature: {generator_high.generate('Hello world', length=5)}")
     
     print("\n✅ All examples completed successfully!")
@@ -0,0 +1,318 @@
+"""
+Shared HTTP helpers for the API clients and chatbots
+Used by: 5_api_client.py, 6_gemini_openai_client.py, 8_legal_bot.py, secure_intern_app.py
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+from threading import Lock
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+import aiohttp
+import orjson
+import requests
+import tiktoken
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+# Model each provider is called with
+MODELS = {"openai": "gpt-3.5-turbo", "gemini": "gemini-1.5-flash"}
+
+# Context window (prompt + completion tokens) of each checked model
+MODEL_CTX = {"gpt-3.5-turbo": 16_385}
+
+# (connect, read) timeouts in seconds for blocking provider calls
+REQUEST_TIMEOUT = (10, 60)
+
+def create_session(headers: Optional[Dict[str, str]] = None) -> requests.Session:
+    """Create a pooled session that keeps TCP/TLS connections alive
+    
+    Retries 429/5xx responses with backoff, for POSTs too.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=3,
+            backoff_factor=0.2,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=None,  # Retry every method: LLM APIs are called with POST
+            raise_on_status=False  # Hand the last response to raise_for_status()
+        )
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if headers:
+        session.headers.update(headers)
+    return session
+
+
+# Pooled blocking session: repeat calls to a provider reuse its TCP/TLS connection
+HTTP_SESSION = create_session()
+
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+def post_json(url: str, payload: Dict[str, Any],
+              headers: Optional[Dict[str, str]] = None, stream: bool = False) -> requests.Response:
+    """POST an orjson-encoded payload on the pooled session"""
+    return HTTP_SESSION.post(
+        url,
+        data=orjson.dumps(payload),
+        headers={**JSON_HEADERS, **headers} if headers else JSON_HEADERS,
+        stream=stream,
+        timeout=REQUEST_TIMEOUT
+    )
+
+
+def iter_sse_data(response: requests.Response) -> Iterator[bytes]:
+    """Yield the raw payload of each SSE `data:` line, stopping at [DONE]
+    
+    Splits the raw byte stream directly rather than through iter_lines,
+    keeping per-chunk Python work to one split and a prefix check.
+    """
+    buffer = b""
+    # The trailing newline flushes a final line the server left unterminated
+    for chunk in chain(response.iter_content(chunk_size=4096), (b"\n",)):
+        buffer += chunk
+        if b"\n" not in chunk:
+            continue
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if not line.startswith(b"data: "):
+                continue
+            data = line[6:].rstrip(b"\r")  # Servers may end lines with CRLF
+            if data == b"[DONE]":
+                return
+            yield data
+
+
+# Provider -> where a streamed chunk keeps its text fragment
+STREAM_TEXT: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "openai": lambda chunk: chunk["choices"][0]["delta"].get("content"),
+    "gemini": lambda chunk: chunk["candidates"][0]["content"]["parts"][0]["text"]
+}
+
+
+def stream_text(provider: str, url: str, payload: Dict[str, Any],
+                headers: Optional[Dict[str, str]] = None) -> Iterator[str]:
+    """POST a streaming request and yield text fragments as they arrive"""
+    chunk_text = STREAM_TEXT[provider]
+    with post_json(url, payload, headers, stream=True) as response:
+        response.raise_for_status()
+        for data in iter_sse_data(response):
+            try:
+                text = chunk_text(orjson.loads(data))
+            except (orjson.JSONDecodeError, LookupError):
+                continue  # Keep-alives and chunks without text (e.g. finish_reason only)
+            if text:
+                yield text
+
+
+@lru_cache(maxsize=8)
+def _openai_encoding(model: str) -> Optional[tiktoken.Encoding]:
+    """An OpenAI model's tiktoken encoder, or None if it can't be loaded
+    
+    The first load downloads the BPE table; a failure (e.g. offline) is
+    cached too, so later requests don't retry the download.
+    """
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=8)
+def _count_tokens(model: str, text: str) -> int:
+    """Token count of a fixed text, such as a system prompt"""
+    return len(_openai_encoding(model).encode_ordinary(text))
+
+
+def fits_context(provider: str, system_prompt: str, prompt: str, max_tokens: int) -> bool:
+    """Whether system prompt, prompt and a max_tokens reply fit the model's context
+    
+    Counted locally, so an oversized prompt never costs a network round-trip.
+    Fails open: only OpenAI models are checked (Gemini's 1M-token window
+    rejects nothing realistic), and only when the encoder is available.
+    """
+    if provider != "openai":
+        return True
+    model = MODELS[provider]
+    encoding = _openai_encoding(model)
+    if encoding is None:
+        return True
+    used = _count_tokens(model, system_prompt) + len(encoding.encode_ordinary(prompt))
+    return used + max_tokens < MODEL_CTX[model]
+
+
+def response_cache_key(provider: str, system_prompt: str, question: str) -> str:
+    """Cache key for a question: trivially different phrasings share one key"""
+    model = MODELS.get(provider, provider)
+    # Lowercase and collapse whitespace, so "Hi  there" and "hi there" match
+    normalized = " ".join(question.lower().split())
+    digest = hashlib.blake2b(
+        f"{provider}\0{system_prompt}\0{normalized}".encode(), digest_size=16
+    ).hexdigest()
+    return f"llm:{model}:{digest}"
+
+
+class ResponseCache:
+    """Two-tier response cache: in-process LRU, then an optional Redis
+    
+    redis_client is anything with get(key) and setex(key, ttl, value),
+    e.g. redis.Redis(); its entries expire after ttl seconds. Redis errors
+    are logged and ignored: an outage only costs cache hits.
+    """
+    
+    def __init__(self, maxsize: int = 1024, redis_client: Any = None, ttl: int = 300):
+        self.maxsize = maxsize
+        self.redis = redis_client
+        self.ttl = ttl
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = Lock()  # Streamlit shares one client across threads
+    
+    def _remember(self, key: str, value: str):
+        """Store in the local LRU, evicting the oldest entry when full"""
+        with self._lock:
+            self._local[key] = value
+            self._local.move_to_end(key)
+            if len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+    
+    def get(self, key: str) -> Optional[str]:
+        """Cached response for key, or None"""
+        with self._lock:
+            value = self._local.get(key)
+            if value is not None:
+                self._local.move_to_end(key)
+                return value
+        
+        if self.redis is not None:
+            try:
+                value = self.redis.get(key)
+            except Exception as e:
+                logger.warning("Redis cache read failed: %s", e)
+                return None
+            if value is not None:
+                value = value.decode() if isinstance(value, bytes) else value
+                self._remember(key, value)
+                return value
+        return None
+    
+    def set(self, key: str, value: str):
+        """Cache a successful response in both tiers
+        
+        Empty responses (e.g. a safety-blocked Gemini candidate, whose stream
+        carries no text) are skipped so the question is asked again next time.
+        """
+        if not value:
+            return
+        self._remember(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.setex(key, self.ttl, value)
+            except Exception as e:
+                logger.warning("Redis cache write failed: %s", e)
+
+
+# One async keep-alive session shared by every bot (per running event loop)
+_async_session: Optional[aiohttp.ClientSession] = None
+_async_session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_async_session() -> aiohttp.ClientSession:
+    """Get the shared aiohttp session for the running event loop
+    
+    Await close_async_session() before that loop ends (e.g. at the end of
+    the coroutine passed to asyncio.run), or the session leaks.
+    """
+    global _async_session, _async_session_loop
+    loop = asyncio.get_running_loop()
+    if _async_session is None or _async_session.closed or _async_session_loop is not loop:
+        _async_session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=32, limit_per_host=16, keepalive_timeout=60)
+        )
+        _async_session_loop = loop
+    return _async_session
+
+
+async def close_async_session():
+    """Close the shared session before the event loop shuts down"""
+    global _async_session
+    if _async_session is not None and not _async_session.closed:
+        await _async_session.close()
+    _async_session = None
+
+
+async def post_json_async(url: str, payload: Dict[str, Any],
+                          headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """POST a JSON payload and return the decoded JSON response"""
+    async with get_async_session().post(
+        url,
+        data=orjson.dumps(payload),
+        headers={**JSON_HEADERS, **headers} if headers else JSON_HEADERS
+    ) as response:
+        response.raise_for_status()
+        return orjson.loads(await response.read())
+
+
+@dataclass
+class BatchProcessor:
+    """Run many LLM requests concurrently within provider rate limits
+    
+    At most max_concurrency requests are in flight; request starts are
+    spaced to stay under rpm (and tpm, when given), and HTTP 429 responses
+    are retried with exponential backoff plus jitter.
+    """
+    max_concurrency: int = 8
+    rpm: int = 60
+    tpm: Optional[int] = None
+    max_retries: int = 5
+    
+    _semaphore: asyncio.Semaphore = field(init=False, repr=False)
+    _lock: asyncio.Lock = field(init=False, repr=False)
+    _next_request: float = field(default=0.0, init=False, repr=False)
+    _next_tokens: float = field(default=0.0, init=False, repr=False)
+    
+    def __post_init__(self):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._lock = asyncio.Lock()
+    
+    async def _wait_for_capacity(self, tokens: int):
+        """Reserve the next start time allowed by rpm/tpm and sleep until it"""
+        async with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request, self._next_tokens)
+            self._next_request = start + 60.0 / self.rpm
+            if self.tpm:
+                self._next_tokens = start + tokens * 60.0 / self.tpm
+        if start > now:
+            await asyncio.sleep(start - now)
+    
+    async def submit(self, call: Callable[..., Awaitable[T]], *args: Any, tokens: int = 0) -> T:
+        """Await call(*args) under the concurrency and rate limits
+        
+        tokens is the request's estimated prompt + completion size, used for tpm.
+        """
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                await self._wait_for_capacity(tokens)
+                try:
+                    return await call(*args)
+                except aiohttp.ClientResponseError as e:
+                    if e.status != 429 or attempt == self.max_retries:
+                        raise
+                    # Exponential backoff with jitter so retries don't stampede
+                    await asyncio.sleep(min(60.0, 2 ** attempt) * (0.5 + random.random()))
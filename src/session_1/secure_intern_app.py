@@ -3,13 +3,20 @@ The Secure Intern - Streamlit Chatbot
 Reference: docs/session_1/9_product_secure_intern.md
 """
 
+import asyncio
+import ahocorasick
+import orjson
 import streamlit as st
-import requests
-import json
 import re
-from typing import Tuple
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 from datetime import datetime
 
+from llm_utils import (
+    MODELS, BatchProcessor, ResponseCache, close_async_session, fits_context,
+    post_json, post_json_async, response_cache_key, stream_text
+)
+
 # Page configuration
 st.set_page_config(
     page_title="The Secure Intern",
@@ -50,23 +57,42 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Chat history kept in the session; older messages are dropped beyond this
+MAX_HISTORY_MESSAGES = 50
+
+# Security keywords (inline security check)
+ILLEGAL_KEYWORDS = (
+    "how to hack", "how to steal", "how to cheat",
+    "illegal way", "break the law", "avoid taxes illegally",
+    "money laundering", "drug dealing", "weapon", "violence"
+)
+# Aho-Corasick automaton: one pass over a query checks every keyword
+_ILLEGAL_AC = ahocorasick.Automaton()
+for _keyword in ILLEGAL_KEYWORDS:
+    _ILLEGAL_AC.add_word(_keyword, _keyword)
+_ILLEGAL_AC.make_automaton()
+
+INJECTION_PATTERNS = (
+    r"ignore.*instruction", r"forget.*you.*are",
+    r"system.*prompt", r"previous.*instruction"
+)
+# Compiled once per process and shared by every client;
+# IGNORECASE removes the need to lowercase queries
+_INJECTION_RES = tuple(re.compile(p, re.IGNORECASE) for p in INJECTION_PATTERNS)
+
+
 class SecureAIClient:
     """Secure AI client"""
     
-    def __init__(self, api_key: str, provider: str = "gemini"):
+    def __init__(self, api_key: str, provider: str = "gemini", cache: Optional[ResponseCache] = None):
         self.api_key = api_key
         self.provider = provider
+        self.max_tokens = 500
+        # Repeat questions are answered without a provider round-trip
+        self.cache = cache or ResponseCache()
         
-        # Security keywords (inline security check)
-        self.illegal_keywords = [
-            "how to hack", "how to steal", "how to cheat",
-            "illegal way", "break the law", "avoid taxes illegally",
-            "money laundering", "drug dealing", "weapon", "violence"
-        ]
-        self.injection_patterns = [
-            r"ignore.*instruction", r"forget.*you.*are",
-            r"system.*prompt", r"previous.*instruction"
-        ]
+        self.illegal_keywords = ILLEGAL_KEYWORDS
+        self.injection_patterns = INJECTION_PATTERNS
         
         self.system_prompt = """You are a helpful AI assistant called "The Secure Intern".
 
@@ -80,35 +106,136 @@ STRICT RULES:
     
     def _validate_input(self, query: str) -> Tuple[bool, str]:
         """Validate input for security"""
-        query_lower = query.lower()
-        
-        # Check illegal content
-        for keyword in self.illegal_keywords:
-            if keyword in query_lower:
-                return False, "Query blocked: Contains illegal content reference"
+        # Check illegal content (one automaton pass covers every keyword)
+        for _ in _ILLEGAL_AC.iter(query.lower()):
+            return False, "Query blocked: Contains illegal content reference"
         
         # Check injection
-        for pattern in self.injection_patterns:
-            if re.search(pattern, query_lower):
+        for rx in _INJECTION_RES:
+            if rx.search(query):
                 return False, "Query blocked: Potential security threat"
         
         return True, "Valid"
     
-    def chat(self, user_input: str, stream: bool = False) -> str:
-        """Chat with AI"""
+    def _blocked_response(self, message: str) -> str:
+        """Response for a query that failed validation"""
+        return f"❌ {message}\n\nI cannot assist with that query. Please ask something else."
+    
+    def _fits(self, user_input: str) -> bool:
+        """Whether system prompt, input and reply fit the model's context window"""
+        return fits_context(self.provider, self.system_prompt, user_input, self.max_tokens)
+    
+    def chat(self, user_input: str, stream: bool = False) -> Union[str, Iterator[str]]:
+        """Chat with AI
+        
+        With stream=True, returns an iterator of text chunks instead.
+        """
+        if stream:
+            return self._chat_stream(user_input)
+        
         # Validate input
         is_valid, message = self._validate_input(user_input)
         if not is_valid:
-            return f"❌ {message}\n\nI cannot assist with that query. Please ask something else."
+            return self._blocked_response(message)
+        if not self._fits(user_input):
+            return self._blocked_response("Query blocked: Too long for the model's context window")
+        
+        key = response_cache_key(self.provider, self.system_prompt, user_input)
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+        
+        # Call AI (only successful responses are cached)
+        try:
+            if self.provider == "openai":
+                response = self._call_openai(user_input)
+            else:
+                response = self._call_gemini(user_input)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        
+        self.cache.set(key, response)
+        return response
+    
+    def _chat_stream(self, user_input: str) -> Iterator[str]:
+        """Validate, then stream the response (blocked, cached and error messages arrive as one chunk)"""
+        is_valid, message = self._validate_input(user_input)
+        if not is_valid:
+            yield self._blocked_response(message)
+            return
+        if not self._fits(user_input):
+            yield self._blocked_response("Query blocked: Too long for the model's context window")
+            return
+        
+        key = response_cache_key(self.provider, self.system_prompt, user_input)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            for chunk in self._stream(self.provider, user_input):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            yield f"Error: {str(e)}"
+            return
+        
+        # Cache only streams that ran to completion
+        if chunks:
+            self.cache.set(key, "".join(chunks))
+    
+    async def chat_async(self, user_input: str, batch: Optional[BatchProcessor] = None) -> str:
+        """Chat with AI without blocking the event loop
+        
+        Pass a BatchProcessor to run under its concurrency and rate limits.
+        """
+        is_valid, message = self._validate_input(user_input)
+        if not is_valid:
+            return self._blocked_response(message)
+        if not self._fits(user_input):
+            return self._blocked_response("Query blocked: Too long for the model's context window")
         
-        # Call AI
+        key = response_cache_key(self.provider, self.system_prompt, user_input)
+        response = self.cache.get(key)
+        if response is not None:
+            return response
+        
+        try:
+            if batch is None:
+                response = await self._complete_async(user_input)
+            else:
+                # Rough size: ~4 characters per token, plus the completion budget
+                tokens = (len(self.system_prompt) + len(user_input)) // 4 + self.max_tokens
+                response = await batch.submit(self._complete_async, user_input, tokens=tokens)
+        except Exception as e:
+            return f"Error: {str(e)}"
+        
+        self.cache.set(key, response)
+        return response
+    
+    async def chat_many(self, user_inputs: List[str], batch: Optional[BatchProcessor] = None) -> List[str]:
+        """Chat about many inputs concurrently, respecting provider rate limits"""
+        batch = batch or BatchProcessor()
+        try:
+            return list(await asyncio.gather(*(self.chat_async(text, batch) for text in user_inputs)))
+        finally:
+            # Each asyncio.run() has its own loop; don't leave its session open
+            await close_async_session()
+    
+    async def _complete_async(self, user_input: str) -> str:
+        """Call the configured provider asynchronously (raises on failure)"""
         if self.provider == "openai":
-            return self._call_openai(user_input, stream)
-        else:
-            return self._call_gemini(user_input, stream)
+            url, headers, payload = self._openai_request(user_input, stream=False)
+            result = await post_json_async(url, payload, headers)
+            return result['choices'][0]['message']['content']
+        url, payload = self._gemini_request(user_input)
+        result = await post_json_async(url, payload)
+        return result['candidates'][0]['content']['parts'][0]['text']
     
-    def _call_openai(self, user_input: str, stream: bool) -> str:
-        """Call OpenAI API"""
+    def _openai_request(self, user_input: str, stream: bool) -> Tuple[str, Dict[str, str], Dict[str, Any]]:
+        """Build OpenAI URL, headers and payload"""
         url = "https://api.openai.com/v1/chat/completions"
         headers = {
             "Authorization": f"Bearer {self.api_key}",
@@ -116,56 +243,21 @@ STRICT RULES:
         }
         
         payload = {
-            "model": "gpt-3.5-turbo",
+            "model": MODELS["openai"],
             "messages": [
                 {"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": user_input}
             ],
             "temperature": 0.7,
-            "max_tokens": 500,
+            "max_tokens": self.max_tokens,
             "stream": stream
         }
-        
-        try:
-            if stream:
-                return self._stream_openai(url, headers, payload)
-            else:
-                response = requests.post(url, json=payload, headers=headers)
-                response.raise_for_status()
-                result = response.json()
-                return result['choices'][0]['message']['content']
-        except Exception as e:
-            return f"Error: {str(e)}"
-    
-    def _stream_openai(self, url: str, headers: dict, payload: dict):
-        """Stream OpenAI response"""
-        response = requests.post(url, json=payload, headers=headers, stream=True)
-        response.raise_for_status()
-        
-        full_response = ""
-        for line in response.iter_lines():
-            if line:
-                decoded = line.decode('utf-8')
-                if decoded.startswith('data: '):
-                    json_str = decoded[6:]
-                    if json_str == '[DONE]':
-                        break
-                    try:
-                        data = json.loads(json_str)
-                        if 'choices' in data:
-                            delta = data['choices'][0].get('delta', {})
-                            content = delta.get('content', '')
-                            if content:
-                                full_response += content
-                                yield content
-                    except:
-                        pass
-        
-        return full_response
+        return url, headers, payload
     
-    def _call_gemini(self, user_input: str, stream: bool) -> str:
-        """Call Gemini API"""
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent?key={self.api_key}"
+    def _gemini_request(self, user_input: str, stream: bool = False) -> Tuple[str, Dict[str, Any]]:
+        """Build Gemini URL and payload"""
+        method = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+        url = f"https://generativelanguage.googleapis.com/v1beta/models/{MODELS['gemini']}:{method}key={self.api_key}"
         
         full_prompt = f"{self.system_prompt}\n\nUser: {user_input}\n\nAssistant:"
         
@@ -174,18 +266,45 @@ STRICT RULES:
                 "parts": [{"text": full_prompt}]
             }]
         }
+        return url, payload
+    
+    def _stream(self, provider: str, user_input: str) -> Iterator[str]:
+        """Stream the response from either provider, one text fragment at a time"""
+        if provider == "openai":
+            url, headers, payload = self._openai_request(user_input, stream=True)
+            return stream_text(provider, url, payload, headers)
+        url, payload = self._gemini_request(user_input, stream=True)
+        return stream_text(provider, url, payload)
+    
+    def _call_openai(self, user_input: str) -> str:
+        """Call OpenAI API (raises on failure)"""
+        url, headers, payload = self._openai_request(user_input, stream=False)
         
-        try:
-            response = requests.post(url, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            return result['candidates'][0]['content']['parts'][0]['text']
-        except Exception as e:
-            return f"Error: {str(e)}"
+        response = post_json(url, payload, headers)
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        return result['choices'][0]['message']['content']
+    
+    def _call_gemini(self, user_input: str) -> str:
+        """Call Gemini API (raises on failure)"""
+        url, payload = self._gemini_request(user_input)
+        
+        response = post_json(url, payload)
+        response.raise_for_status()
+        result = orjson.loads(response.content)
+        return result['candidates'][0]['content']['parts'][0]['text']
+
+
+@st.cache_resource
+def get_client(api_key: str, provider: str) -> SecureAIClient:
+    """One client per (api_key, provider), shared across reruns and sessions"""
+    return SecureAIClient(api_key, provider)
+
 
 # Initialize session state
 if "messages" not in st.session_state:
-    st.session_state.messages = []
+    # Bounded, so long sessions don't grow session state and rerun time
+    st.session_state.messages = deque(maxlen=MAX_HISTORY_MESSAGES)
 if "api_key" not in st.session_state:
     st.session_state.api_key = ""
 if "provider" not in st.session_state:
@@ -212,16 +331,16 @@ with st.sidebar:
         index=0 if st.session_state.provider == "openai" else 1
     )
     
-    # Initialize client
-    if api_key and api_key != st.session_state.api_key:
+    # Initialize client (cached: reruns with the same settings reuse it)
+    if api_key and (api_key, provider) != (st.session_state.api_key, st.session_state.provider):
         st.session_state.api_key = api_key
         st.session_state.provider = provider
-        st.session_state.client = SecureAIClient(api_key, provider)
+        st.session_state.client = get_client(api_key, provider)
         st.success("✅ Client initialized!")
     
     # Clear chat button
     if st.button("🗑️ Clear Chat"):
-        st.session_state.messages = []
+        st.session_state.messages.clear()
         st.rerun()
     
     # Info
@@ -263,41 +382,12 @@ if prompt := st.chat_input("Ask me anything (safely)!"):
         response_placeholder = st.empty()
         full_response = ""
         
-        # Check if streaming is supported
-        if st.session_state.provider == "openai":
-            # Try streaming
-            try:
-                stream_generator = st.session_state.client._stream_openai(
-                    "https://api.openai.com/v1/chat/completions",
-                    {
-                        "Authorization": f"Bearer {st.session_state.api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    {
-                        "model": "gpt-3.5-turbo",
-                        "messages": [
-                            {"role": "system", "content": st.session_state.client.system_prompt},
-                            {"role": "user", "content": prompt}
-                        ],
-                        "temperature": 0.7,
-                        "max_tokens": 500,
-                        "stream": True
-                    }
-                )
-                
-                for chunk in stream_generator:
-                    full_response += chunk
-                    response_placeholder.markdown(full_response + "▌")
-                
-                response_placeholder.markdown(full_response)
-            except:
-                # Fallback to non-streaming
-                full_response = st.session_state.client.chat(prompt, stream=False)
-                response_placeholder.markdown(full_response)
-        else:
-            # Non-streaming for Gemini
-            full_response = st.session_state.client.chat(prompt, stream=False)
-            response_placeholder.markdown(full_response)
+        # One path for both providers: validated, streamed, errors arrive as text
+        for chunk in st.session_state.client.chat(prompt, stream=True):
+            full_response += chunk
+            response_placeholder.markdown(full_response + "▌")
+        
+        response_placeholder.markdown(full_response)
     
     # Add assistant response
     st.session_state.messages.append({"role": "assistant", "content": full_response})